@@ -1,115 +1,328 @@
 import os
-import json
-import requests
+import functools
+import asyncio
+import aiofiles
+import aiohttp
+import orjson
+from collections import defaultdict
 from datetime import datetime, date
-import pytz
+from operator import itemgetter
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
 
 # --- Constants and Configuration ---
-# Timezone for Bangladesh
-TIMEZONE = pytz.timezone("Asia/Dhaka") 
-# Get today's date and day name based on the specified timezone
-TODAY = datetime.now(TIMEZONE)
-# Get just the date part for comparisons
-TODAY_DATE = TODAY.date()
-DAY_NAME = TODAY.strftime('%A')
-# Format for matching dates in deadlines.json and special_events.json (e.g., "2025-07-16")
-DATE_STR_YMD = TODAY.strftime('%Y-%m-%d')
-# Format for matching dates in self_learning.json (e.g., "July 16")
-DATE_STR_MONTH_DAY = TODAY.strftime('%B %d')
-# Formatted date for the message header (e.g., "Tuesday, July 15")
-FORMATTED_DATE = TODAY.strftime('%A, %B %d')
+
+class TodayContext(NamedTuple):
+    """Today's date in the configured timezone, pre-formatted for every lookup."""
+    tz: ZoneInfo
+    today: datetime
+    today_date: date
+    day_name: str
+    day_key: str
+    ymd: str
+    month_day: str
+    formatted: str
+
+@functools.lru_cache(maxsize=1)
+def _today_context():
+    """Builds the date context once per process."""
+    # Timezone for Bangladesh
+    tz = ZoneInfo("Asia/Dhaka")
+    # Get today's date and day name based on the specified timezone
+    today = datetime.now(tz)
+    day_name = today.strftime('%A')
+    return TodayContext(
+        tz=tz,
+        today=today,
+        # Get just the date part for comparisons
+        today_date=today.date(),
+        day_name=day_name,
+        # Lowercased day name, the key class_routine.json is grouped by
+        day_key=day_name.lower(),
+        # Format for matching dates in deadlines.json and special_events.json (e.g., "2025-07-16")
+        ymd=today.strftime('%Y-%m-%d'),
+        # Format for matching dates in self_learning.json (e.g., "July 16")
+        month_day=today.strftime('%B %d'),
+        # Formatted date for the message header (e.g., "Tuesday, July 15")
+        formatted=today.strftime('%A, %B %d'),
+    )
+
+_CTX = _today_context()
+TIMEZONE = _CTX.tz
+TODAY = _CTX.today
+TODAY_DATE = _CTX.today_date
+DAY_NAME = _CTX.day_name
+DAY_KEY = _CTX.day_key
+DATE_STR_YMD = _CTX.ymd
+DATE_STR_MONTH_DAY = _CTX.month_day
+FORMATTED_DATE = _CTX.formatted
+
+# HTTP retry settings: retries only where resending cannot duplicate a
+# message (see post_with_retry)
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.3
+# Longest rate-limit wait (seconds) worth sitting out instead of giving up
+HTTP_MAX_RETRY_AFTER = 60
+
+# Telegram rejects messages over 4096 characters, counted in UTF-16 code
+# units (see telegram_length); stay a little under it
+TELEGRAM_MESSAGE_LIMIT = 4000
+
+# Due strings for deadlines 0 and 1 days away, indexed by days left
+DUE_SOON = ("Due Today!", "Due Tomorrow!")
 
 # --- Helper Functions ---
 
-def load_json_data(file_path):
-    """Safely loads data from a JSON file."""
+def group_by(records, key):
+    """Groups a list of records into a dict of lists keyed by key(record)."""
+    groups = defaultdict(list)
+    for record in records:
+        groups[key(record)].append(record)
+    return groups
+
+async def load_json_data(file_path, index_by=None):
+    """Safely loads data from a JSON file, optionally grouped with index_by."""
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        async with aiofiles.open(file_path, 'rb') as f:
+            data = orjson.loads(await f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError) as e:
         print(f"Error loading {file_path}: {e}")
-        return [] # Return an empty list on error for safer processing
+        data = [] # Use an empty list on error for safer processing
+    return group_by(data, index_by) if index_by else data
+
+@functools.lru_cache(maxsize=None)
+def class_start_minutes(time_range):
+    """Returns the start of a class time range (e.g., "8:00 AM-9:20 AM") as minutes past midnight."""
+    start = time_range.split('-', 1)[0].strip()
+    clock, meridiem = start.split()
+    hour, minute = clock.split(':')
+    # 12 AM is midnight and 12 PM is noon
+    hour = int(hour) % 12
+    if meridiem.upper() == 'PM':
+        hour += 12
+    return hour * 60 + int(minute)
 
-def get_todays_classes(routine):
-    """Get today's class schedule from a list of classes."""
-    if not routine:
+def get_todays_classes(routine_by_day):
+    """Get today's class schedule from classes grouped by lowercased day."""
+    if not routine_by_day:
         return "• No classes found in routine file."
     
-    todays_classes = [c for c in routine if c.get('day', '').lower() == DAY_NAME.lower()]
+    todays_classes = list(routine_by_day.get(DAY_KEY, []))
 
     if not todays_classes:
         return "• No classes today. Enjoy the free time!"
     
-    todays_classes.sort(key=lambda x: datetime.strptime(x['time'].split('-')[0].strip(), "%I:%M %p"))
+    todays_classes.sort(key=lambda x: class_start_minutes(x['time']))
     class_messages = [f"• {c['course']} — {c['time']} at {c['room']} ({c['floor']})" for c in todays_classes]
     return "\n".join(class_messages)
 
-def get_todays_learning(plan):
-    """Get today's self-learning plan from a list of dated tasks."""
-    if not plan:
+def get_todays_learning(plan_by_date):
+    """Get today's self-learning plan from tasks grouped by date."""
+    if not plan_by_date:
         return "• No self-learning plan found."
         
-    learning_tasks = [p['task'] for p in plan if p.get('date') == DATE_STR_MONTH_DAY]
+    learning_tasks = [p['task'] for p in plan_by_date.get(DATE_STR_MONTH_DAY, [])]
     if not learning_tasks:
         return "• No specific learning tasks for today."
     task_messages = [f"• {task}" for task in learning_tasks]
     return "\n".join(task_messages)
 
+@functools.lru_cache(maxsize=None)
+def short_date(ordinal):
+    """Formats a proleptic Gregorian ordinal as a short date (e.g., "Jul 26")."""
+    return date.fromordinal(ordinal).strftime('%b %d')
+
+def format_due(deadline_date, days_left):
+    """Formats how far away a deadline is (e.g., "Due in 3 days (Jul 26)")."""
+    if days_left < len(DUE_SOON):
+        return DUE_SOON[days_left]
+    return f"Due in {days_left} days ({short_date(deadline_date.toordinal())})"
+
 def get_upcoming_deadlines(deadlines):
     """Gets all upcoming deadlines, sorted by date."""
     if not deadlines:
         return "• No deadlines found."
 
-    upcoming = []
+    # Parse, filter and compute days left in a single pass
+    rows = []
     for d in deadlines:
         try:
-            # Convert deadline date string to a date object
-            deadline_date = datetime.strptime(d['date'], '%Y-%m-%d').date()
-            # Add to list if the deadline is today or in the future
-            if deadline_date >= TODAY_DATE:
-                upcoming.append(d)
-        except (ValueError, KeyError):
+            deadline_date = date.fromisoformat(d['date'])
+            task = d['task']
+        except (ValueError, TypeError, KeyError):
             # Skip malformed entries
             continue
+        # Keep the deadline if it is today or in the future
+        if deadline_date >= TODAY_DATE:
+            rows.append((deadline_date, (deadline_date - TODAY_DATE).days, task))
     
-    if not upcoming:
+    if not rows:
         return "• No upcoming deadlines. You're all caught up!"
 
     # Sort the deadlines by date
-    upcoming.sort(key=lambda x: x['date'])
-
-    deadline_messages = []
-    for d in upcoming:
-        deadline_date = datetime.strptime(d['date'], '%Y-%m-%d').date()
-        days_left = (deadline_date - TODAY_DATE).days
-        
-        # Format the due date string
-        if days_left == 0:
-            due_str = "Due Today!"
-        elif days_left == 1:
-            due_str = "Due Tomorrow!"
-        else:
-            # Format date as "Jul 26"
-            formatted_date = deadline_date.strftime('%b %d')
-            due_str = f"Due in {days_left} days ({formatted_date})"
-            
-        deadline_messages.append(f"• {d['task']} — {due_str}")
-
+    rows.sort(key=itemgetter(0))
+    deadline_messages = [f"• {task} — {format_due(deadline_date, days_left)}"
+                         for deadline_date, days_left, task in rows]
     return "\n".join(deadline_messages)
 
 
-def get_todays_events(events):
-    """Get special events for today from a list."""
-    if not events:
+def get_todays_events(events_by_date):
+    """Get special events for today from events grouped by date."""
+    if not events_by_date:
         return "• No special events scheduled for today."
-    today_events = [e for e in events if e.get('date') == DATE_STR_YMD]
+    today_events = events_by_date.get(DATE_STR_YMD, [])
     if not today_events:
         return "• No special events scheduled for today."
     # event_messages = [f"• {e['event']} — {e['time']} @ {e['location']}" for e in today_events]
     event_messages = [f"• {e['event']} — {e['time']}" for e in today_events]
     return "\n".join(event_messages)
 
-def send_telegram_message(bot_token, user_id, message):
+def build_message(user_name, classes, learning, deadlines, events):
+    """Assembles the daily plan message from its sections."""
+    # Joining a flat list builds the message in one allocation
+    parts = [
+        "",
+        f"🗓️ *Good Morning {user_name}!*",
+        f"*Here's your plan for today ({FORMATTED_DATE}):*",
+        "",
+        "🎓 *Classes*:",
+        classes,
+        "",
+        "📚 *Self-Learning*:",
+        learning,
+        "",
+        "📌 *Upcoming Deadlines*:",
+        deadlines,
+        "",
+        "🎯 *Special Events*:",
+        events,
+        "",
+    ]
+    return "\n".join(parts)
+
+def telegram_length(text):
+    """Returns the length of text as Telegram counts it, in UTF-16 code units."""
+    return len(text.encode('utf-16-le')) // 2
+
+def safe_cut(line, end):
+    """Returns the last whitespace index at or before end that is outside any Markdown entity, or None."""
+    cut = None
+    # Open entity: '*', '_' or '`' until its closing marker, '[' for link
+    # text and '(' for the link URL that follows it
+    entity = None
+    escaped = False
+    for i, char in enumerate(line[:end + 1]):
+        if escaped:
+            escaped = False
+        elif entity is None:
+            if char.isspace() and i > 0:
+                cut = i
+            elif char == '\\':
+                escaped = True
+            elif char in '*_`[':
+                entity = char
+        elif entity == '[':
+            if char == ']':
+                entity = '(' if line[i + 1:i + 2] == '(' else None
+        elif entity == '(':
+            if char == ')':
+                entity = None
+        elif char == entity:
+            entity = None
+    return cut
+
+def split_line(line, limit):
+    """Cuts a line longer than limit into (separator, piece) pairs that rejoin to the line."""
+    pieces = []
+    separator = ""
+    while telegram_length(line) > limit:
+        # Longest prefix that fits; characters outside the BMP take two units
+        end = units = 0
+        for char in line:
+            units += 2 if ord(char) > 0xFFFF else 1
+            if units > limit:
+                break
+            end += 1
+        # Cut at the last whitespace outside a Markdown entity so *bold*,
+        # [text](url) and the like stay whole; a line with no such point is
+        # hard-cut, which can break its formatting
+        cut = safe_cut(line, end)
+        if cut is None:
+            pieces.append((separator, line[:end]))
+            line, separator = line[end:], ""
+        else:
+            pieces.append((separator, line[:cut]))
+            line, separator = line[cut + 1:], line[cut]
+    pieces.append((separator, line))
+    return pieces
+
+def split_message(message, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Splits a message into chunks no longer than limit, breaking at section boundaries."""
+    if telegram_length(message) <= limit:
+        return [message]
+
+    # Break at blank lines between sections, then at line breaks, and only
+    # cut through a line as a last resort; each piece keeps the separator
+    # that preceded it so the original layout survives the split
+    pieces = []
+    for section in message.split("\n\n"):
+        if telegram_length(section) <= limit:
+            pieces.append(("\n\n", section))
+            continue
+        separator = "\n\n"
+        for line in section.split("\n"):
+            line_pieces = split_line(line, limit)
+            pieces.append((separator, line_pieces[0][1]))
+            pieces.extend(line_pieces[1:])
+            separator = "\n"
+
+    chunks = []
+    current = ""
+    for separator, piece in pieces:
+        candidate = current + separator + piece if current else piece
+        if telegram_length(candidate) <= limit:
+            current = candidate
+        else:
+            chunks.append(current)
+            current = piece
+    chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+def retry_after(body):
+    """Returns the wait in seconds a Telegram 429 response asks for, or None."""
+    try:
+        return orjson.loads(body)['parameters']['retry_after']
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        return None
+
+async def post_with_retry(session, url, **kwargs):
+    """POSTs through the shared session, retrying only when resending is safe. Returns (status, body).
+
+    sendMessage is not idempotent, so timeouts, dropped connections and 5xx
+    responses are never retried: the message may already have been delivered.
+    Only failed connects, where the request never reached Telegram, are
+    retried with backoff, and 429s are retried after the retry_after
+    Telegram asks for.
+    """
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == HTTP_MAX_RETRIES
+        try:
+            async with session.post(url, **kwargs) as response:
+                body = await response.text()
+        except aiohttp.ClientConnectorError:
+            if last_attempt:
+                raise
+            await asyncio.sleep(HTTP_BACKOFF_FACTOR * 2 ** attempt)
+            continue
+
+        if response.status != 429 or last_attempt:
+            return response.status, body
+        wait = retry_after(body)
+        if wait is None or wait > HTTP_MAX_RETRY_AFTER:
+            return response.status, body
+        await asyncio.sleep(wait)
+
+async def send_telegram_message(session, bot_token, user_id, message):
     """Sends a message to a Telegram user with detailed error logging."""
     url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
     payload = {
@@ -119,19 +332,25 @@ def send_telegram_message(bot_token, user_id, message):
     }
     
     print("\n--- Telegram Payload ---")
-    print(json.dumps(payload, indent=2))
+    print(orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
     print("------------------------\n")
 
     try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
+        status, body = await post_with_retry(
+            session, url, data=orjson.dumps(payload), headers={'Content-Type': 'application/json'}
+        )
+        if status >= 400:
+            print(f"Failed to send message. Status Code: {status}")
+            print(f"Telegram API Response: {body}")
+            return
         print("Message sent successfully!")
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to send message. Status Code: {e.response.status_code}")
-        print(f"Telegram API Response: {e.response.text}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Failed to send message: {e}")
 
 # --- Main Execution ---
-if __name__ == "__main__":
+
+async def amain():
+    """Loads the routine files, builds today's plan and sends it."""
     # --- Load Secrets from Environment Variables ---
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     TELEGRAM_USER_ID = os.getenv("TELEGRAM_USER_ID")
@@ -141,10 +360,14 @@ if __name__ == "__main__":
         exit(1)
 
     # --- Load Data ---
-    class_routine = load_json_data("routines/class_routine.json")
-    self_learning_plan = load_json_data("routines/self_learning.json")
-    deadlines = load_json_data("routines/deadlines.json")
-    special_events = load_json_data("routines/special_events.json")
+    # The files are independent, so read them concurrently; the dated and
+    # daily files are grouped on load so each lookup below is a dict access
+    class_routine, self_learning_plan, deadlines, special_events = await asyncio.gather(
+        load_json_data("routines/class_routine.json", lambda c: c.get('day', '').lower()),
+        load_json_data("routines/self_learning.json", lambda p: p.get('date')),
+        load_json_data("routines/deadlines.json"),
+        load_json_data("routines/special_events.json", lambda e: e.get('date')),
+    )
     
     # --- Build Message Sections ---
     classes_section = get_todays_classes(class_routine)
@@ -155,21 +378,16 @@ if __name__ == "__main__":
     user_name = "Muhitul" 
     
     # --- Finalize and Send Message ---
-    final_message = f"""
-🗓️ *Good Morning {user_name}!*
-*Here's your plan for today ({FORMATTED_DATE}):*
-
-🎓 *Classes*:
-{classes_section}
-
-📚 *Self-Learning*:
-{learning_section}
+    final_message = build_message(
+        user_name, classes_section, learning_section, deadlines_section, events_section
+    )
+    
+    # A single session reuses its keep-alive connection for every request
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=20)) as session:
+        # Send long plans in parts, one after another so they arrive in order
+        for chunk in split_message(final_message):
+            await send_telegram_message(session, TELEGRAM_BOT_TOKEN, TELEGRAM_USER_ID, chunk)
 
-📌 *Upcoming Deadlines*:
-{deadlines_section}
 
-🎯 *Special Events*:
-{events_section}
-"""
-    
-    send_telegram_message(TELEGRAM_BOT_TOKEN, TELEGRAM_USER_ID, final_message)
+if __name__ == "__main__":
+    asyncio.run(amain())